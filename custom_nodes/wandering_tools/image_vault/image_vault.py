@@ -30,8 +30,26 @@ Connect ImageVault as an output node in your ComfyUI pipeline. The node will aut
 All files are saved in the output/ folder with incrementing file names.
 """
 import os
+import re
 import json
+import logging
+import secrets
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 from PIL import Image as PILImage
+from PIL.PngImagePlugin import PngInfo
+
+logger = logging.getLogger("ImageVault")
+
+# Compiled filename-index patterns, keyed by (prefix, ext) so repeated saves
+# with the same naming scheme never recompile the regex.
+_IDX_RE_CACHE = {}
+
+# Random per-process prefix plus an atomic counter: unique ids without
+# timestamp collisions or syscalls.
+_UID_PREFIX = secrets.token_hex(3)
+_UID_COUNTER = itertools.count()
 
 class ImageVault:
     """
@@ -65,6 +83,9 @@ class ImageVault:
                 ],),
                 "prefix": ("STRING", {"default": ""}),
             },
+            "optional": {
+                "compress_level": ("INT", {"default": 6, "min": 0, "max": 9}),
+            },
             "hidden": {
                 "prompt": "PROMPT",
                 "extra_pnginfo": "EXTRA_PNGINFO"
@@ -78,85 +99,128 @@ class ImageVault:
         """
         return True
 
-    def save(self, image, mode, prefix, prompt=None, extra_pnginfo=None):
+    def save(self, image, mode, prefix, compress_level=6, prompt=None, extra_pnginfo=None):
         """
         Saves the image and workflow metadata according to the selected mode.
         - image_only: saves only the image in output/
         - image_with_metadata: saves PNG with embedded workflow metadata in output/
         - thumbnail_with_metadata: saves PNG thumbnail with metadata in output/snapshot/, full image in output/
         - json_with_workflow: saves image in output/, JSON file with workflow in output/snapshot/
+
+        compress_level controls PNG compression (0 = none/fastest, 9 = max);
+        libpng compression dominates save time for large images.
         """
-        print(f"[ImageVault] Save called with mode='{mode}', prefix='{prefix}'")
+        logger.debug("Save called with mode='%s', prefix='%s'", mode, prefix)
         # Save directory
         save_dir = os.path.join(os.getcwd(), "output")
         os.makedirs(save_dir, exist_ok=True)
-        print(f"[ImageVault] Output directory: {save_dir}")
+        logger.debug("Output directory: %s", save_dir)
         # Find the next available index for file naming (like ComfyUI SaveImage)
         def get_next_index(folder, prefix, ext):
-            import re
-            max_idx = 0
-            for fname in os.listdir(folder):
-                if fname.startswith(prefix) and fname.endswith(ext):
-                    m = re.search(rf"{re.escape(prefix)}(\\d+)\\{ext}$", fname)
-                    if m:
-                        idx = int(m.group(1))
-                        if idx > max_idx:
-                            max_idx = idx
-            # Ensure no file is overwritten
-            while True:
-                candidate = f"{prefix}{max_idx+1:05d}{ext}"
-                if not os.path.exists(os.path.join(folder, candidate)):
-                    break
-                max_idx += 1
+            pat = _IDX_RE_CACHE.get((prefix, ext))
+            if pat is None:
+                pat = re.compile(rf"{re.escape(prefix)}(\d+){re.escape(ext)}$")
+                _IDX_RE_CACHE[(prefix, ext)] = pat
+            # Single scandir pass; the regex already yields the true max index,
+            # so no extra os.path.exists probing is needed.
+            with os.scandir(folder) as it:
+                max_idx = max(
+                    (int(m.group(1)) for e in it
+                     if e.is_file() and (m := pat.match(e.name))),
+                    default=0,
+                )
             return max_idx + 1
         ext = ".png"
         idx = get_next_index(save_dir, prefix, ext)
         base_name = f"{prefix}{idx:05d}"
         image_path = os.path.join(save_dir, base_name + ext)
-        print(f"[ImageVault] Image will be saved as: {image_path}")
+        logger.debug("Image will be saved as: %s", image_path)
         # Save the image
         try:
             pil_img = self._to_pil(image)
-            print(f"[ImageVault] Image converted to PIL.Image. Size: {pil_img.size}")
+            logger.debug("Image converted to PIL.Image. Size: %s", pil_img.size)
         except Exception as e:
-            print(f"[ImageVault] ERROR converting image to PIL.Image: {e}")
+            logger.error("ERROR converting image to PIL.Image: %s", e)
             raise
-        metadata = self._get_workflow_metadata(prompt, extra_pnginfo)
-        print(f"[ImageVault] Workflow metadata extracted: {json.dumps(metadata)[:200]}{'...' if len(json.dumps(metadata))>200 else ''}")
+        # image_only never touches the workflow, so skip extraction and
+        # serialization entirely on that path.
+        if mode != "image_only":
+            metadata = self._get_workflow_metadata(prompt, extra_pnginfo)
+            # Serialize the workflow at most once, and only for the modes that
+            # embed it in a PngInfo; json_with_workflow writes the dict
+            # straight to file with its own (indented) serialization.
+            meta_json = None
+            if (mode in ("image_with_metadata", "thumbnail_with_metadata")
+                    and isinstance(metadata, dict) and "version" in metadata):
+                meta_json = json.dumps(metadata)
+            if logger.isEnabledFor(logging.DEBUG):
+                s = meta_json if meta_json is not None else json.dumps(metadata)
+                logger.debug("Workflow metadata extracted: %s%s",
+                             s[:200], "..." if len(s) > 200 else "")
+        else:
+            metadata = None
+            meta_json = None
         try:
             if mode == "image_only":
-                pil_img.save(image_path)
-                print(f"[ImageVault] Image saved (image_only mode)")
+                pil_img.save(image_path, compress_level=compress_level)
+                logger.debug("Image saved (image_only mode)")
             elif mode == "image_with_metadata":
-                pil_img.save(image_path, pnginfo=self._make_pnginfo(metadata))
-                print(f"[ImageVault] Image saved with metadata (image_with_metadata mode)")
+                pil_img.save(image_path, compress_level=compress_level,
+                             pnginfo=self._make_pnginfo(metadata, meta_json))
+                logger.debug("Image saved with metadata (image_with_metadata mode)")
             elif mode == "thumbnail_with_metadata":
                 # Save thumbnail with metadata in snapshot subfolder
                 snapshot_dir = os.path.join(save_dir, f"{prefix}snapshot_{self._get_unique_id()}")
                 os.makedirs(snapshot_dir, exist_ok=True)
-                thumb = pil_img.copy()
-                thumb.thumbnail((256, 256))
+                # Resize straight to the target size: copy() + in-place
+                # thumbnail() would allocate a full-resolution duplicate first.
+                w, h = pil_img.size
+                scale = min(256 / w, 256 / h, 1.0)
+                if scale < 1.0:
+                    thumb = pil_img.resize(
+                        (max(1, int(w * scale)), max(1, int(h * scale))),
+                        PILImage.LANCZOS)
+                else:
+                    # Must be a distinct object: the two save() calls below run
+                    # concurrently and Image.save stashes its parameters on the
+                    # image itself, so saving one object from two threads races.
+                    thumb = pil_img.copy()
                 thumb_path = os.path.join(snapshot_dir, base_name + "_thumb" + ext)
-                thumb.save(thumb_path, pnginfo=self._make_pnginfo(metadata))
-                print(f"[ImageVault] Thumbnail saved with metadata: {thumb_path}")
-                # Always save the original image in output/
-                pil_img.save(image_path)
-                print(f"[ImageVault] Full image saved in output/ (thumbnail_with_metadata mode)")
+                pnginfo = self._make_pnginfo(metadata, meta_json)
+                # PIL releases the GIL during libpng compression, so the two
+                # encodes overlap instead of running back to back.
+                with ThreadPoolExecutor(max_workers=2) as ex:
+                    futures = [
+                        ex.submit(pil_img.save, image_path, compress_level=compress_level),
+                        ex.submit(thumb.save, thumb_path, compress_level=compress_level, pnginfo=pnginfo),
+                    ]
+                    for fut in futures:
+                        fut.result()
+                logger.debug("Thumbnail saved with metadata: %s", thumb_path)
+                logger.debug("Full image saved in output/ (thumbnail_with_metadata mode)")
             elif mode == "json_with_workflow":
                 # Save JSON with workflow metadata in snapshot subfolder, with _workflow suffix
                 snapshot_dir = os.path.join(save_dir, f"{prefix}snapshot_{self._get_unique_id()}")
                 os.makedirs(snapshot_dir, exist_ok=True)
                 json_path = os.path.join(snapshot_dir, base_name + "_workflow.json")
-                with open(json_path, "w") as f:
-                    json.dump(metadata, f, indent=2)
-                print(f"[ImageVault] Workflow metadata saved as JSON: {json_path}")
-                # Always save the original image in output/
-                pil_img.save(image_path)
-                print(f"[ImageVault] Full image saved in output/ (json_with_workflow mode)")
+
+                def write_json():
+                    with open(json_path, "w") as f:
+                        json.dump(metadata, f, indent=2)
+
+                with ThreadPoolExecutor(max_workers=2) as ex:
+                    futures = [
+                        ex.submit(pil_img.save, image_path, compress_level=compress_level),
+                        ex.submit(write_json),
+                    ]
+                    for fut in futures:
+                        fut.result()
+                logger.debug("Workflow metadata saved as JSON: %s", json_path)
+                logger.debug("Full image saved in output/ (json_with_workflow mode)")
         except Exception as e:
-            print(f"[ImageVault] ERROR during file save: {e}")
+            logger.error("ERROR during file save: %s", e)
             raise
-        print(f"[ImageVault] Save operation completed for: {image_path}")
+        logger.info("Save operation completed for: %s", image_path)
         # No return, as this is an output node
         return ()
 
@@ -164,62 +228,85 @@ class ImageVault:
         """
         Converts the image to PIL.Image format, handling batches and channels.
         """
-        print(f"[ImageVault] _to_pil called. Type: {type(image)}")
-        import numpy as np
+        logger.debug("_to_pil called. Type: %s", type(image))
         if hasattr(image, 'cpu'):
-            arr = image.cpu().numpy()
+            import torch
+            t = image
+            if t.requires_grad:
+                t = t.detach()
+            # Remove batch dimensions if present
+            while t.ndim > 3:
+                t = t[0]
+            # Transpose if channels are in the wrong order
+            if t.shape[0] == 3 and t.shape[-1] != 3:
+                t = t.permute(1, 2, 0)
+            # Scale, clamp and cast on the (possibly GPU) tensor so only the
+            # final uint8 buffer crosses to numpy, instead of round-tripping
+            # a float array through clip/multiply/astype on the CPU.
+            if t.dtype != torch.uint8:
+                t = t.mul(255).clamp_(0, 255).to(torch.uint8)
+            arr = t.contiguous().cpu().numpy()
         else:
             arr = np.array(image)
-        print(f"[ImageVault] Numpy array shape: {arr.shape}, dtype: {arr.dtype}")
-        # Remove batch dimensions if present
-        while arr.ndim > 3:
-            arr = arr[0]
-        # Transpose if channels are in the wrong order
-        if arr.shape[-1] != 3 and arr.shape[0] == 3:
-            arr = arr.transpose(1, 2, 0)
-        # Ensure values are in [0,1]
-        if arr.dtype != np.uint8:
-            arr = np.clip(arr, 0, 1)
-            arr = (arr * 255).astype('uint8')
-        print(f"[ImageVault] Final array shape for PIL: {arr.shape}, dtype: {arr.dtype}")
+            # Remove batch dimensions if present
+            while arr.ndim > 3:
+                arr = arr[0]
+            # Transpose if channels are in the wrong order
+            if arr.shape[-1] != 3 and arr.shape[0] == 3:
+                arr = arr.transpose(1, 2, 0)
+            # Ensure values are in [0,1], scaling in place where possible
+            if arr.dtype != np.uint8:
+                arr = np.clip(arr, 0, 1)
+                np.multiply(arr, 255, out=arr, casting='unsafe')
+                arr = arr.astype(np.uint8)
+        # A non-contiguous array (e.g. after transpose) would make fromarray
+        # copy the whole image internally; no-op if already contiguous.
+        arr = np.ascontiguousarray(arr)
+        logger.debug("Final array shape for PIL: %s, dtype: %s", arr.shape, arr.dtype)
+        # fromarray derives L/RGB/RGBA from shape and dtype itself; its mode
+        # parameter is deprecated since Pillow 11.3.
         return PILImage.fromarray(arr)
 
     def _get_unique_id(self):
         """
-        Generates a unique ID based on the current timestamp.
+        Generates a unique ID from the process random prefix and an
+        incrementing counter. Two saves can never collide, unlike the
+        previous millisecond-timestamp scheme.
         """
-        import time
-        uid = str(int(time.time() * 1000))
-        print(f"[ImageVault] Generated unique id: {uid}")
+        uid = f"{_UID_PREFIX}{next(_UID_COUNTER):06d}"
+        logger.debug("Generated unique id: %s", uid)
         return uid
 
     def _get_workflow_metadata(self, prompt=None, extra_pnginfo=None):
         """
         Extracts the workflow from the metadata provided by ComfyUI (PROMPT or EXTRA_PNGINFO).
         """
-        print("[ImageVault] Attempting to extract workflow metadata from PROMPT or EXTRA_PNGINFO ...")
+        logger.debug("Attempting to extract workflow metadata from PROMPT or EXTRA_PNGINFO ...")
         if extra_pnginfo is not None and isinstance(extra_pnginfo, dict) and 'workflow' in extra_pnginfo:
-            print("[ImageVault] Extracted workflow from extra_pnginfo.")
+            logger.debug("Extracted workflow from extra_pnginfo.")
             return extra_pnginfo['workflow']
         if prompt is not None and isinstance(prompt, dict) and "version" in prompt:
-            print("[ImageVault] Extracted workflow from PROMPT input.")
+            logger.debug("Extracted workflow from PROMPT input.")
             return prompt
-        print("[ImageVault] Warning: No workflow provided via PROMPT or EXTRA_PNGINFO input.")
+        logger.warning("No workflow provided via PROMPT or EXTRA_PNGINFO input.")
         return {}
 
-    def _make_pnginfo(self, metadata):
+    def _make_pnginfo(self, metadata, meta_json=None):
         """
         Creates a PNGInfo object with the workflow metadata, if valid.
+        Accepts an optional pre-serialized JSON string to avoid re-encoding.
         """
-        from PIL.PngImagePlugin import PngInfo
         pnginfo = PngInfo()
         # Add metadata only if it is a valid workflow dictionary (must have 'version' key)
         if isinstance(metadata, dict) and "version" in metadata:
             try:
-                pnginfo.add_text("workflow", json.dumps(metadata))
-                print("[ImageVault] Metadata injected into PNG.")
+                pnginfo.add_text("workflow", meta_json if meta_json is not None else json.dumps(metadata))
+                logger.debug("Metadata injected into PNG.")
             except Exception as e:
-                print(f"[ImageVault] ERROR injecting metadata into PNG: {e}")
+                logger.error("ERROR injecting metadata into PNG: %s", e)
         else:
-            print(f"[ImageVault] Warning: Provided workflow metadata is not valid or missing 'version' key. Metadata will not be injected. Metadata: {json.dumps(metadata, indent=2)}")
+            logger.warning("Provided workflow metadata is not valid or missing "
+                           "'version' key. Metadata will not be injected.")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Rejected metadata: %s", json.dumps(metadata, indent=2))
         return pnginfo
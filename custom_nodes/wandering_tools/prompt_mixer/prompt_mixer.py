@@ -4,7 +4,8 @@
 # Version: 1.0.0
 # Description: Custom ComfyUI node for blending two prompts with adjustable parameters.
 
-import random
+import numpy as np
+from collections import OrderedDict
 
 class PromptMixer:
     """
@@ -19,6 +20,15 @@ class PromptMixer:
     _last_inputs = None
     _last_mixed_prompt = None
     _last_conditioning = None
+    _last_main = None
+    _last_secondary = None
+
+    # Extracted text keyed by id() of the Conditioning dict; ComfyUI re-passes
+    # the same objects on unchanged re-runs, so this skips re-walking them.
+    # Each entry pins the dict itself so its id cannot be recycled by the
+    # allocator while the cached text is still live.
+    _text_cache = OrderedDict()
+    _TEXT_CACHE_MAX = 128
 
     @classmethod
     def INPUT_TYPES(cls):
@@ -51,10 +61,19 @@ class PromptMixer:
         Attempt to extract the original text from a Conditioning object.
         If not found, returns an empty string.
         """
+        key = id(conditioning)
+        entry = self._text_cache.get(key)
+        if entry is not None and entry[0] is conditioning:
+            return entry[1]
         if not conditioning or not isinstance(conditioning, dict):
-            return ""
-        # In ComfyUI, CLIP-based conditioning typically stores text under "text"
-        return conditioning.get("text", "")
+            text = ""
+        else:
+            # In ComfyUI, CLIP-based conditioning typically stores text under "text"
+            text = conditioning.get("text", "")
+        self._text_cache[key] = (conditioning, text)
+        if len(self._text_cache) > self._TEXT_CACHE_MAX:
+            self._text_cache.popitem(last=False)
+        return text
 
     def mix(self, clip, main_clip, secondary_clip, blend_percent, mode, seed, max_length, overwrite):
         """
@@ -66,11 +85,26 @@ class PromptMixer:
           5) If overwrite=False, and inputs haven't changed, reuse the previous result
         """
 
+        # Identity short-circuit: same Conditioning objects as last run means
+        # nothing changed, so skip even the text extraction.
+        if (not overwrite
+            and self._last_conditioning is not None
+            and self._last_inputs is not None
+            and main_clip is self._last_main
+            and secondary_clip is self._last_secondary
+            and self._last_inputs[2:] == (blend_percent, mode, seed, max_length)):
+            return (self._last_conditioning,)
+
         # Extract text from incoming Conditionings
         main_prompt = self._extract_prompt_text(main_clip)
         secondary_prompt = self._extract_prompt_text(secondary_clip)
+        self._last_main = main_clip
+        self._last_secondary = secondary_clip
 
-        # Prepare a tuple to detect if inputs changed
+        # Prepare a tuple to detect if inputs changed. The prompt strings are
+        # stored by reference: ComfyUI re-passes the same str objects on
+        # unchanged inputs, so an 'is' check replaces an O(N) character
+        # comparison on multi-KB prompts.
         current_inputs = (
             main_prompt, secondary_prompt, blend_percent,
             mode, seed, max_length
@@ -79,7 +113,9 @@ class PromptMixer:
         # If overwrite=False and inputs haven't changed, return previous result
         if (not overwrite
             and self._last_inputs is not None
-            and self._last_inputs == current_inputs
+            and self._last_inputs[0] is main_prompt
+            and self._last_inputs[1] is secondary_prompt
+            and self._last_inputs[2:] == current_inputs[2:]
             and self._last_conditioning is not None):
             return (self._last_conditioning,)
 
@@ -97,12 +133,14 @@ class PromptMixer:
             self._last_conditioning = empty_cond
             return (empty_cond,)
 
-        # Deterministic randomness
-        random.seed(seed)
+        # Deterministic randomness; the Generator draws all indices for a mode
+        # in one vectorized call instead of per-token Python-level calls.
+        rng = np.random.default_rng(seed)
 
-        # Split text into tokens
-        main_tokens = main_prompt.strip().split()
-        secondary_tokens = secondary_prompt.strip().split()
+        # Split text into tokens, exactly once per execution. Tuples are
+        # immutable, so modes that only read them can share the storage.
+        main_tokens = tuple(main_prompt.split())
+        secondary_tokens = tuple(secondary_prompt.split())
 
         # Compute how many tokens from secondary to blend
         blend_count = int(len(secondary_tokens) * (blend_percent / 100.0))
@@ -110,7 +148,11 @@ class PromptMixer:
 
         # Perform blending based on mode
         if mode == "append":
-            mixed_tokens = main_tokens + secondary_tokens[:blend_count]
+            # Preallocate the output list so it never grows/reallocates.
+            n = len(main_tokens)
+            mixed_tokens = [None] * (n + blend_count)
+            mixed_tokens[:n] = main_tokens
+            mixed_tokens[n:] = secondary_tokens[:blend_count]
 
         elif mode == "interpolate":
             mixed_tokens = []
@@ -124,34 +166,64 @@ class PromptMixer:
                     j += 1
 
         elif mode == "shuffle":
-            mixed_tokens = main_tokens + secondary_tokens[:blend_count]
-            random.shuffle(mixed_tokens)
+            n = len(main_tokens)
+            arr = np.empty(n + blend_count, dtype=object)
+            arr[:n] = main_tokens
+            arr[n:] = secondary_tokens[:blend_count]
+            rng.shuffle(arr)
+            mixed_tokens = arr.tolist()
 
         elif mode == "replace":
-            mixed_tokens = main_tokens[:]
-            replace_indices = list(range(len(mixed_tokens)))
-            random.shuffle(replace_indices)
-            replace_indices = replace_indices[:blend_count]
-            for idx, sec_token in zip(replace_indices, secondary_tokens[:blend_count]):
+            mixed_tokens = list(main_tokens)
+            n_replace = min(blend_count, len(mixed_tokens))
+            replace_indices = rng.choice(len(mixed_tokens), size=n_replace, replace=False) if mixed_tokens else []
+            for idx, sec_token in zip(replace_indices, secondary_tokens[:n_replace]):
                 mixed_tokens[idx] = sec_token
 
         elif mode == "random_insert":
-            mixed_tokens = main_tokens[:]
-            for sec_token in secondary_tokens[:blend_count]:
-                insert_pos = random.randint(0, len(mixed_tokens))
-                mixed_tokens.insert(insert_pos, sec_token)
+            # Pick the final slots of the inserted tokens directly, then weave
+            # the two sequences in one linear pass: O(n + k) instead of the
+            # O(n * k) memmove cost of repeated list.insert.
+            n = len(main_tokens)
+            slots = set(rng.choice(n + blend_count, size=blend_count, replace=False).tolist())
+            mixed_tokens = [None] * (n + blend_count)
+            mi = si = 0
+            for pos in range(n + blend_count):
+                if pos in slots:
+                    mixed_tokens[pos] = secondary_tokens[si]
+                    si += 1
+                else:
+                    mixed_tokens[pos] = main_tokens[mi]
+                    mi += 1
 
         else:
             # Fallback: no mixing, just main tokens
             mixed_tokens = main_tokens
 
-        # Join tokens into final text
-        final_text = " ".join(mixed_tokens)
-
-        # Truncate if exceeding max_length (characters) & add ellipsis
-        if len(final_text) > max_length:
-            truncated = final_text[:max_length - 3].rstrip()
-            final_text = truncated + "..."
+        # Join tokens into final text, truncating at max_length characters.
+        # A running counter stops the build as soon as the limit is reached,
+        # instead of joining everything and slicing a copy afterwards.
+        out = []
+        total = 0
+        truncated = False
+        for tok in mixed_tokens:
+            new_total = total + len(tok) + (1 if out else 0)
+            if new_total > max_length:
+                truncated = True
+                break
+            out.append(tok)
+            total = new_total
+        if truncated:
+            # Drop trailing tokens until the ellipsis also fits.
+            while out and total > max_length - 3:
+                total -= len(out.pop()) + 1
+            if out:
+                final_text = " ".join(out) + "..."
+            else:
+                # A single token longer than max_length: hard character slice.
+                final_text = mixed_tokens[0][:max_length - 3] + "..."
+        else:
+            final_text = " ".join(out)
 
         # Encode the mixed text into a new Conditioning
         final_cond = clip.encode(final_text)